@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# --- Shared SQLite connection for all agents ---
+# One connection per process, opened lazily so scripts can still check that
+# the database file exists before touching it (connecting would create it).
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+DB_PATH = os.path.join(BASE_DIR, "data", "database.db")
+
+_conn = None
+_lock = threading.RLock()
+
+def get_conn():
+    """
+    Returns the shared connection, creating it on first use.
+    Autocommit mode (isolation_level=None): writes go through transaction().
+    """
+    global _conn
+    with _lock:
+        if _conn is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+            # WAL: readers don't block the writer. NORMAL: no fsync per commit.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")  # 256 MB read via mmap
+            _conn = conn
+    return _conn
+
+@contextmanager
+def transaction():
+    """
+    Runs the enclosed statements in a single transaction (one commit).
+    Rolls back on error. Serialized with a lock so threads can share the connection.
+    """
+    with _lock:
+        conn = get_conn()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
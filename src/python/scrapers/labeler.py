@@ -1,82 +1,214 @@
 import sys
 import os
-import sqlite3
+import re
+import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer, util
+import torch
+from model2vec import StaticModel
 
 # --- 1. Path Configuration ---
 # Adjust path to find project root manually
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 
+# Shared SQLite connection (same folder)
+from _db import BASE_DIR, DB_PATH, get_conn, transaction
+
 # Paths
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-DB_PATH = os.path.join(BASE_DIR, "data", "database.db")
+EMBEDDINGS_DIR = os.path.join(BASE_DIR, "data", "embeddings")
 
 # --- 2. Configuration ---
 # Threshold: How similar must the texts be to consider them a match?
 # 0.85 is a safe conservative value. 0.75 might catch more but risks errors.
 SIMILARITY_THRESHOLD = 0.85
 
-# Model: 'all-MiniLM-L6-v2' is small, fast, and very good for semantic search.
-# It runs on CPU easily.
-MODEL_NAME = 'all-MiniLM-L6-v2'
+# Lower bar used only to log "potential matches" for inspection
+PREVIEW_THRESHOLD = 0.5
+
+# Model: 'potion-base-8M' is a static (model2vec) embedding model distilled
+# from a sentence transformer. Encoding is a token lookup + mean pooling, so it
+# is orders of magnitude faster than MiniLM on CPU for a small loss in quality.
+MODEL_NAME = 'minishlab/potion-base-8M'
+
+# Sentences per encode batch. Inputs are length-sorted first, so batches
+# carry little padding; static models are cheap enough for large batches.
+ENCODE_BATCH_SIZE = 1024
+
+# Similarity in FP16 on GPU (tensor cores, half the memory traffic).
+# FP16 is plenty for a 0.85 threshold; set to False to force the FP32 path.
+USE_HALF_PRECISION = True
+
+# Articles per similarity tile: peak memory is O(block * (dim + n_facts))
+# instead of O(n_articles * n_facts) for the full score matrix.
+MATCH_BLOCK_SIZE = 4096
 
 def get_unlabeled_articles():
     """Fetch articles from 'articles' table that don't have a label yet."""
-    conn = sqlite3.connect(DB_PATH)
     # We select ID and Title (Titles contain the main claim usually)
     query = "SELECT id, title FROM articles WHERE verified_label IS NULL"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+    return pd.read_sql_query(query, get_conn())
 
 def get_fact_checks():
     """Fetch all claims from the fact-checker database."""
-    conn = sqlite3.connect(DB_PATH)
-    query = "SELECT id, claim, verdict FROM fact_checks"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+    query = "SELECT id, claim, verdict FROM fact_checks ORDER BY id"
+    return pd.read_sql_query(query, get_conn())
+
+# PolitiFact verdicts (Truth-O-Meter / Flip-O-Meter image alt text) -> binary label
+# 1 (FAKE), 0 (REAL), None (Ambiguous: we ignore half-true and the flip ratings)
+VERDICT_MAP = {
+    'true': 0,
+    'mostly-true': 0,
+    'half-true': None,
+    'barely-true': 1,
+    'false': 1,
+    'pants-fire': 1,
+    'full-flop': None,
+    'half-flip': None,
+    'no-flip': None,
+}
 
 def map_verdict_to_label(verdict_text):
     """
     Converts PolitiFact text verdicts to our binary system.
     Returns: 1 (FAKE), 0 (REAL), or None (Ambiguous)
     """
-    v = verdict_text.lower()
-    
-    # FAKE indicators
-    if any(x in v for x in ['false', 'pants-fire', 'barely-true']):
-        return 1
-    # REAL indicators
-    elif any(x in v for x in ['true', 'mostly-true']):
-        return 0
-    
-    return None # we ignore half-true
+    return VERDICT_MAP.get(verdict_text.lower().strip())
+
+# --- 3. Database Writes ---
+# Label updates are collected during the matching loop and written at the end
+_pending_labels = []
+
+UPDATE_LABEL_SQL = '''
+    UPDATE articles 
+    SET verified_label = ?, label_source = ?
+    WHERE id = ?
+'''
 
 def update_article_label(article_id, label, source_info):
-    """Updates the article with the Ground Truth label."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    """Queues the Ground Truth label for the article (written by flush_labels)."""
+    _pending_labels.append((int(label), source_info, int(article_id)))
+    print(f"      💾 Tagged Article #{article_id} as: {'FAKE 🚨' if label==1 else 'REAL ✅'}")
+
+def flush_labels():
+    """Writes all queued labels in a single transaction."""
+    if not _pending_labels:
+        return
+
     try:
-        c.execute('''
-            UPDATE articles 
-            SET verified_label = ?, label_source = ?
-            WHERE id = ?
-        ''', (label, source_info, article_id))
-        
-        conn.commit()
-        print(f"      💾 Tagged Article #{article_id} as: {'FAKE 🚨' if label==1 else 'REAL ✅'}")
+        with transaction() as conn:
+            conn.executemany(UPDATE_LABEL_SQL, _pending_labels)
+        print(f"💾 Saved {len(_pending_labels)} labels to the database.")
         
     except Exception as e:
         print(f"      ❌ DB Error: {e}")
     finally:
-        conn.close()
+        _pending_labels.clear()
+
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+def title_key(titles):
+    """
+    Normalized title used to detect republished headlines (casefolded, no punctuation/extra spaces).
+    Uses Python's Unicode-aware `re`: pandas' pyarrow-backed strings run regexes on
+    RE2, where \\w is ASCII-only and non-Latin headlines would collapse to ''.
+    """
+    return titles.fillna('').map(lambda s: ' '.join(PUNCTUATION_RE.sub('', s.casefold()).split()))
+
+def get_device():
+    """Picks the fastest available device: CUDA, Apple Silicon (MPS) or CPU."""
+    if torch.cuda.is_available():
+        return 'cuda'
+    if torch.backends.mps.is_available():
+        return 'mps'
+    return 'cpu'
+
+def encode_texts(model, texts):
+    """
+    Encodes texts into L2-normalized vectors using "smart batching":
+    sentences are sorted by length so each batch pads to a similar size,
+    then the vectors are scattered back to the original order.
+    """
+    order = np.argsort([len(t) for t in texts], kind='stable')
+    sorted_texts = [texts[i] for i in order]
+
+    emb_sorted = model.encode(sorted_texts, batch_size=ENCODE_BATCH_SIZE, show_progress_bar=True).astype(np.float32)
+    emb_sorted /= np.maximum(np.linalg.norm(emb_sorted, axis=1, keepdims=True), 1e-12)
+
+    emb = np.empty_like(emb_sorted)
+    emb[order] = emb_sorted
+    return emb
+
+def similarity_matrix(art_norm, fact_norm):
+    """
+    Cosine similarity between two sets of L2-normalized vectors,
+    i.e. a plain matrix product. Returns FP32 scores of shape (n_articles, n_facts).
+    """
+    if USE_HALF_PRECISION and art_norm.is_cuda:
+        return (art_norm.half() @ fact_norm.half().T).float()
+    return art_norm @ fact_norm.T
+
+def get_cached_embeddings(model, keys, texts, name):
+    """
+    Returns (embeddings, rows): the on-disk cache of L2-normalized vectors,
+    memory-mapped read-only, and the cache row of each key, so that
+    embeddings[rows[i]] is the vector of texts[i].
+
+    Vectors are persisted in data/embeddings/ and only the keys missing
+    from the cache are encoded (incremental runs encode just the delta).
+    """
+    prefix = os.path.join(EMBEDDINGS_DIR, f"{name}_{MODEL_NAME.replace('/', '_')}")
+    emb_path, ids_path = f"{prefix}_embeddings.npy", f"{prefix}_ids.npy"
+    keys = np.asarray(keys)
+    if keys.dtype == object:
+        # Title keys: fixed-width unicode, so the ids file is saved without pickle
+        keys = keys.astype(str)
+
+    cached_ids = keys[:0]
+    if os.path.exists(emb_path) and os.path.exists(ids_path):
+        try:
+            cached_ids = np.load(ids_path)
+        except ValueError:
+            # Ids file from an older version (pickled object array): rebuild the cache
+            print(f"⚠️ Unreadable {name} cache ids, re-encoding everything.")
+
+    missing = ~np.isin(keys, cached_ids)
+    if missing.any():
+        print(f"Encoding {missing.sum()} new {name} to vectors ({len(keys) - missing.sum()} cached)...")
+        new_texts = np.asarray(texts, dtype=object)[missing].tolist()
+        new_emb = encode_texts(model, new_texts)
+        n_old = len(cached_ids)
+
+        # Write old + new rows to a fresh memmap (the old cache is copied
+        # page by page, never loaded whole), then swap it in atomically.
+        # The ids file is written last: a crash in between only leaves unused rows.
+        os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
+        tmp_path = f"{prefix}_embeddings.tmp.npy"
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                        shape=(n_old + len(new_emb), new_emb.shape[1]))
+        if n_old:
+            out[:n_old] = np.load(emb_path, mmap_mode='r')[:n_old]
+        out[n_old:] = new_emb
+        out.flush()
+        del out
+        os.replace(tmp_path, emb_path)
+
+        cached_ids = np.concatenate([cached_ids, keys[missing]])
+        np.save(ids_path, cached_ids)
+    else:
+        print(f"Loaded {len(keys)} {name} vectors from cache.")
+
+    # Cache row of each requested key
+    rows = pd.Index(cached_ids).get_indexer(keys)
+    return np.load(emb_path, mmap_mode='r'), rows
 
 def run_matcher():
     print(f"--- 🧠 SEMANTIC MATCHER AGENT STARTED ---")
-    print(f"Loading model: {MODEL_NAME}...")
-    model = SentenceTransformer(MODEL_NAME)
+    # Use every core for the similarity matmul (PyTorch often defaults to fewer)
+    torch.set_num_threads(os.cpu_count() or 4)
+    torch.set_num_interop_threads(2)
+    device = get_device()
+
+    print(f"Loading model: {MODEL_NAME} (similarity on {device})...")
+    model = StaticModel.from_pretrained(MODEL_NAME)
     
     # 1. Load Data
     print("Loading data from Data Lake...")
@@ -91,64 +223,96 @@ def run_matcher():
         return
 
     print(f"   Loaded {len(articles)} articles and {len(facts)} fact-checks.")
+
+    # Map every verdict once (vectorized). Ambiguous facts (e.g. "Half True")
+    # can never produce a label, so they are dropped before encoding/matching.
+    facts['num_label'] = facts['verdict'].str.lower().str.strip().map(VERDICT_MAP)
+    facts = facts[facts['num_label'].notna()].reset_index(drop=True)
+
+    if facts.empty:
+        print("❌ No fact-checks with a usable verdict.")
+        return
     
     # 2. Encode Fact-Checks (The Knowledge Base)
-    # We do this once because it's our reference library.
-    print("Encoding fact-checks to vectors...")
-    fact_embeddings = model.encode(facts['claim'].tolist(), convert_to_tensor=True, show_progress_bar=True)
+    # We do this once because it's our reference library (normalized + cached).
+    # The knowledge base is small: it is the only matrix held fully in memory.
+    fact_emb, fact_rows = get_cached_embeddings(model, facts['id'], facts['claim'], "facts")
+    fact_norm = torch.from_numpy(fact_emb[fact_rows]).to(device)
     
     # 3. Iterate & Match
     print("\n🔍 Scanning articles for matches...")
     
-    # We iterate articles one by one (or in batches)
-    # Ideally, encode all articles first for speed, but loop gives better control for logging
-    
-    article_embeddings = model.encode(articles['title'].tolist(), convert_to_tensor=True, show_progress_bar=True)
-    
-    # Calculate Cosine Similarity Matrix
-    # Result is a matrix of size (num_articles, num_facts)
-    cosine_scores = util.cos_sim(article_embeddings, fact_embeddings)
+    # All articles are encoded in one go; matching is then vectorized.
+    # Wire stories republished by several sources share a headline, so only
+    # one title per normalized key is encoded (and cached across runs).
+    articles['key'] = title_key(articles['title'])
+
+    # Titles with no words left (missing, punctuation only) can't be matched,
+    # and must never be merged with each other or cached under the empty key
+    no_title = articles['key'] == ''
+    if no_title.any():
+        print(f"   Skipping {no_title.sum()} articles without a usable title.")
+        articles = articles[~no_title].reset_index(drop=True)
+    if articles.empty:
+        print("❌ No articles with a usable title.")
+        return
+
+    unique = articles.drop_duplicates('key')
+    title_emb, unique_rows = get_cached_embeddings(model, unique['key'], unique['title'], "titles")
+
+    # Cache row of every article (articles sharing a key share the row)
+    article_rows = unique_rows[pd.Index(unique['key']).get_indexer(articles['key'])]
     
+    # Calculate Cosine Similarity in tiles of MATCH_BLOCK_SIZE articles
+    # Both sides are unit vectors, so cosine similarity is a plain matrix product
+    # Each tile is a matrix of size (block, num_facts), reduced and discarded
+    best_scores = np.empty(len(articles), dtype=np.float32)
+    best_idx = np.empty(len(articles), dtype=np.int64)
+
+    for start in range(0, len(articles), MATCH_BLOCK_SIZE):
+        # Only this tile's rows are read from the memory-mapped cache
+        block = torch.from_numpy(title_emb[article_rows[start:start + MATCH_BLOCK_SIZE]]).to(device)
+
+        # Best fact for every article of the tile in one reduction, moved to NumPy once
+        tile_scores, tile_idx = similarity_matrix(block, fact_norm).max(dim=1)
+        best_scores[start:start + len(block)] = tile_scores.cpu().numpy()
+        best_idx[start:start + len(block)] = tile_idx.cpu().numpy()
+
+    # Plain arrays for the loops below (avoids .iloc in the hot path)
+    articles_id = articles['id'].to_numpy()
+    articles_title = articles['title'].to_numpy()
+    facts_claim = facts['claim'].to_numpy()
+    facts_verdict = facts['verdict'].to_numpy()
+    facts_num_label = facts['num_label'].to_numpy(dtype=int)
+
+    # Preview of loose matches
+    previews = np.where(best_scores > PREVIEW_THRESHOLD)[0]
+    for i in previews:
+        print(f"👀 Potential Match ({best_scores[i]:.2f}):")
+        print(f"   News: {articles_title[i][:50]}...")
+        print(f"   Fact: {facts_claim[best_idx[i]][:50]}...")
+    count = len(previews)
+
     matches_found = 0
-    count = 0
-    for i in range(len(articles)):
-        # Find the best match for this article among all facts
-        best_score_tensor = cosine_scores[i].max()
-        best_score = float(best_score_tensor)
+    hits = np.where(best_scores >= SIMILARITY_THRESHOLD)[0]
+    for i in hits:
+        best_score = best_scores[i]
+        best_fact_idx = best_idx[i]
+
+        # Text verdict (e.g. "pants-fire") already mapped to number (1)
+        numeric_label = facts_num_label[best_fact_idx]
         
-        if best_score > 0.5:
-            best_fact_idx = cosine_scores[i].argmax().item()
-            article_row = articles.iloc[i]
-            fact_row = facts.iloc[best_fact_idx]
-            print(f"👀 Potential Match ({best_score:.2f}):")
-            print(f"   News: {article_row['title'][:50]}...")
-            print(f"   Fact: {fact_row['claim'][:50]}...")
-            count += 1
-
-        if best_score >= SIMILARITY_THRESHOLD:
-            # Get the index of the best match
-            best_fact_idx = int(cosine_scores[i].argmax())
-            
-            # Extract data
-            article_row = articles.iloc[i]
-            fact_row = facts.iloc[best_fact_idx]
-            
-            # Map the text verdict (e.g. "Pants on fire") to number (1)
-            numeric_label = map_verdict_to_label(fact_row['verdict'])
-            
-            if numeric_label is not None:
-                print(f"\n✅ MATCH FOUND ({best_score:.2f})")
-                print(f"   📰 News:  {article_row['title']}")
-                print(f"   ⚖️  Fact:  {fact_row['claim']} -> {fact_row['verdict']}")
-                
-                # Update the article directly!
-                source_info = f"Match with PolitiFact (Sim: {best_score:.2f})"
-                update_article_label(article_row['id'], numeric_label, source_info)
-                matches_found += 1
-            else:
-                # Similarity was high, but verdict was ambiguous (e.g. "Half True")
-                pass 
+        print(f"\n✅ MATCH FOUND ({best_score:.2f})")
+        print(f"   📰 News:  {articles_title[i]}")
+        print(f"   ⚖️  Fact:  {facts_claim[best_fact_idx]} -> {facts_verdict[best_fact_idx]}")
+        
+        # Update the article directly!
+        source_info = f"Match with PolitiFact (Sim: {best_score:.2f})"
+        update_article_label(articles_id[i], numeric_label, source_info)
+        matches_found += 1
                 
+    flush_labels()
+
     print(f"\n--- 🏁 MATCHING COMPLETE ---")
     print(f"Auto-labeled {matches_found} articles based on verified facts.")
     print(f"oissible mastches {count}")
@@ -1,10 +1,12 @@
 import sys
 import os
-import sqlite3
-import time
+import asyncio
+import aiohttp
+import requests
 import pandas as pd
 import feedparser
 from newspaper import Article, Config
+from w3lib.encoding import html_to_unicode
 
 # --- 1. Path Configuration (Manual approach) ---
 # We need to go up 3 levels: scrapers -> python -> src -> ROOT
@@ -13,73 +15,189 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 # Define paths relative to the calculated root
 # We use os.path.dirname logic to ensure stability
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-DB_PATH = os.path.join(BASE_DIR, "data", "database.db")
 SOURCES_CSV = os.path.join(BASE_DIR, "data", "sources.csv")
 
+# Shared SQLite connection (same folder)
+from _db import DB_PATH, get_conn, transaction
+
 # Browser User-Agent configuration
 USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 
+# Download concurrency: max simultaneous requests per feed (one feed = one host)
+MAX_CONCURRENT_DOWNLOADS = 8
+POLITE_DELAY = 0.5  # Seconds each worker waits after a request
+
+# Max URLs per "WHERE url IN (...)" query (SQLite limits bound parameters)
+URL_LOOKUP_BATCH = 500
+
+# HTTP session for the RSS feeds themselves (connections reused across feeds)
+feed_session = requests.Session()
+feed_session.headers.update({'User-Agent': USER_AGENT})
+
 def init_db():
     """Creates the necessary tables if they don't exist."""
     print(f"🔨 Connecting to database at: {DB_PATH}")
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    # Table: 'articles'
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS articles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            url TEXT UNIQUE,
-            source TEXT,
-            title TEXT,
-            text TEXT,
-            authors TEXT,
-            publish_date TEXT,
-            scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_processed INTEGER DEFAULT 0
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def save_article_to_db(data):
+    with transaction() as c:
+        # Table: 'articles'
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT UNIQUE,
+                source TEXT,
+                title TEXT,
+                text TEXT,
+                authors TEXT,
+                publish_date TEXT,
+                scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_processed INTEGER DEFAULT 0
+            )
+        ''')
+
+        # Partial index: the predictor only ever reads the unprocessed rows
+        c.execute('''
+            CREATE INDEX IF NOT EXISTS idx_articles_unprocessed
+            ON articles(is_processed) WHERE is_processed = 0
+        ''')
+
+        # Table: 'feed_cache' (HTTP validators of the last fetch of each feed)
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS feed_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT
+            )
+        ''')
+
+# --- 2. Database Access ---
+# Rows are queued and written in one transaction per feed
+_pending_articles = []
+
+INSERT_ARTICLE_SQL = '''
+    INSERT OR IGNORE INTO articles 
+    (url, source, title, text, authors, publish_date)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+def queue_article(data):
+    """Queues an article row to be inserted on the next flush_articles() call."""
+    _pending_articles.append(data)
+
+def flush_articles():
     """
-    Inserts a new article into the database.
-    Returns True if saved, False if duplicate.
+    Inserts all queued articles in a single transaction.
+    Returns the number of new rows saved (duplicates are ignored),
+    or None if the write failed (the transaction is rolled back).
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    if not _pending_articles:
+        return 0
+
     try:
-        c.execute('''
-            INSERT OR IGNORE INTO articles 
-            (url, source, title, text, authors, publish_date)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', data)
-        
-        if c.rowcount > 0:
-            print(f"   💾 Saved: {data[2][:40]}...")
-            conn.commit()
-            return True
-        else:
-            # Uncomment for debugging duplicates
-            # print(f"   ⏭️  Skipped (Duplicate): {data[2][:40]}...")
-            return False
+        with transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(INSERT_ARTICLE_SQL, _pending_articles)
+            saved = conn.total_changes - before
+        print(f"   💾 Saved {saved} new articles ({len(_pending_articles) - saved} duplicates skipped).")
+        return saved
             
     except Exception as e:
         print(f"   ❌ Database Error: {e}")
-        return False
+        return None
     finally:
-        conn.close()
+        _pending_articles.clear()
+
+def get_feed_cache(rss_url):
+    """Returns the (etag, last_modified) stored for a feed, or (None, None)."""
+    row = get_conn().execute(
+        "SELECT etag, last_modified FROM feed_cache WHERE url = ?", (rss_url,)
+    ).fetchone()
+    return row if row else (None, None)
+
+def save_feed_cache(rss_url, etag, last_modified):
+    """Stores the HTTP validators returned by the last fetch of a feed."""
+    with transaction() as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO feed_cache (url, etag, last_modified)
+            VALUES (?, ?, ?)
+        ''', (rss_url, etag, last_modified))
+
+def filter_new_urls(urls):
+    """
+    Returns the URLs that are not in the 'articles' table yet (order kept).
+    One indexed IN() query per batch, so known URLs are never downloaded.
+    """
+    urls = list(dict.fromkeys(urls))  # Feeds sometimes repeat an entry
+    known = set()
+    conn = get_conn()
+
+    for start in range(0, len(urls), URL_LOOKUP_BATCH):
+        batch = urls[start:start + URL_LOOKUP_BATCH]
+        placeholders = ",".join(["?"] * len(batch))
+        rows = conn.execute(f"SELECT url FROM articles WHERE url IN ({placeholders})", batch)
+        known.update(r[0] for r in rows)
+
+    return [u for u in urls if u not in known]
+
+async def fetch(session, url):
+    """
+    Downloads the HTML of a single URL, decoded to str.
+    The bytes are decoded like newspaper4k's own download does (w3lib: HTTP
+    header, then <meta charset>/BOM, then utf-8 with replacement), so pages
+    without a charset header and non-UTF-8 sites don't fail.
+    """
+    async with session.get(url) as response:
+        response.raise_for_status()
+        body = await response.read()
+        _, html = html_to_unicode(response.headers.get('Content-Type'), body, default_encoding='utf-8')
+        return html
+
+async def bounded_fetch(sem, session, url):
+    """
+    Fetches a URL while holding a slot of the semaphore.
+    Returns (url, html) or (url, None) if the download failed.
+    """
+    async with sem:
+        try:
+            html = await fetch(session, url)
+        except Exception as e:
+            # Most common error: 403 Forbidden or 404
+            # We just print a small 'x' to signify a skipped item
+            print(f"   x Failed: {url} ({str(e)[:50]})")
+            html = None
+
+        # Polite delay (only blocks this worker, not the whole batch)
+        await asyncio.sleep(POLITE_DELAY)
+        return url, html
+
+async def fetch_all(urls):
+    """Downloads all URLs concurrently, bounded by MAX_CONCURRENT_DOWNLOADS."""
+    sem = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    timeout = aiohttp.ClientTimeout(total=10)
+
+    async with aiohttp.ClientSession(headers={'User-Agent': USER_AGENT}, timeout=timeout) as session:
+        return await asyncio.gather(*[bounded_fetch(sem, session, url) for url in urls])
 
 def process_feed(source_name, rss_url):
     """
     Scrapes a single feed. Returns the count of new articles saved.
     """
     print(f"\n📡 Scanning: {source_name}...")
-    saved_count = 0
     
+    # Conditional GET: if the feed hasn't changed, the server answers
+    # 304 Not Modified with an empty body and we skip parsing entirely
+    etag, last_modified = get_feed_cache(rss_url)
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
     try:
-        feed = feedparser.parse(rss_url)
+        response = feed_session.get(rss_url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            print("   💤 Feed not modified since last run.")
+            return 0
+        response.raise_for_status()
+        feed = feedparser.parse(response.content)
     except Exception as e:
         print(f"   ❌ Network/Parse Error: {e}")
         return 0
@@ -88,22 +206,27 @@ def process_feed(source_name, rss_url):
         print("   ⚠️  No entries found in feed.")
         return 0
 
-    print(f"   Found {len(feed.entries)} entries. Processing latest 5...")
+    # Skip URLs we already have before any HTTP request
+    urls = filter_new_urls([entry.link for entry in feed.entries])
+    print(f"   Found {len(feed.entries)} entries ({len(urls)} new). Downloading...")
 
     # Newspaper4k Config
     config = Config()
     config.browser_user_agent = USER_AGENT
     config.request_timeout = 10
 
-    # Limit to 5 per feed to avoid bottlenecks in this demo version
-    # (Increase this number or remove the slice for full production)
-    for entry in feed.entries:
-        url = entry.link
-        
+    # 1. Download every new entry concurrently (network bound)
+    pages = asyncio.run(fetch_all(urls))
+
+    # 2. Parse the downloaded HTML (newspaper4k is only used as a parser here)
+    rows = []
+    for url, html in pages:
+        if html is None:
+            continue
+
         try:
-            # Download & Parse
             article = Article(url, config=config)
-            article.download()
+            article.download(input_html=html)
             article.parse()
             
             title = article.title
@@ -115,22 +238,28 @@ def process_feed(source_name, rss_url):
 
             # Quality Filter: Ignore very short texts
             if len(text) > 150:
-                article_data = (url, source_name, title, text, authors, pub_date)
-                
-                if save_article_to_db(article_data):
-                    saved_count += 1
+                rows.append((url, source_name, title, text, authors, pub_date))
             else:
                 pass # Silently ignore short content to keep logs clean
 
-            # Polite delay
-            time.sleep(0.5)
-
         except Exception as e:
-            # Most common error: 403 Forbidden or 404
-            # We just print a small 'x' to signify a skipped item
             print(f"   x Failed: {url} ({str(e)[:50]})")
-            
-    return saved_count
+
+    # 3. Store Data (outside the async path, one transaction per feed)
+    for article_data in rows:
+        queue_article(article_data)
+    saved_count = flush_articles()
+
+    # Remember the validators only if the articles made it to the database:
+    # after a DB error the next run must re-fetch the feed instead of getting a 304.
+    # Failed downloads (mostly permanent 403/404) don't block the cache: news
+    # feeds change often, and URLs still listed are retried on the next change.
+    if saved_count is not None:
+        save_feed_cache(rss_url, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    else:
+        print("   ↩️  Database error: the feed will be re-fetched next run.")
+
+    return saved_count or 0
 
 if __name__ == "__main__":
     print("--- 🦅 MASS HUNTER AGENT STARTED ---")
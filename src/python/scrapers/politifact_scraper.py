@@ -1,107 +1,165 @@
 import sys
 import os
-import sqlite3
 import time
+import threading
 import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from lxml import html, etree
 
 # --- 1. Path Configuration ---
 # Adjust path to find project root manually
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 
-# Paths
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-DB_PATH = os.path.join(BASE_DIR, "data", "database.db")
+# Shared SQLite connection (same folder)
+from _db import DB_PATH, transaction
 
 # --- 2. Configuration ---
 # Target: PolitiFact's fact-check list
 BASE_URL = "https://www.politifact.com/factchecks/list/?page={}"
 PAGES_TO_SCRAPE = 20  # Start with 5 pages (approx 100 facts)
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Concurrency: pages are fetched by a pool of workers, but the rate limiter
+# keeps the global request rate polite (~1 request per second).
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 1.0
+
+# XPath queries (compiled once, evaluated in libxml2)
+# has-class: exact match on one of the space separated classes
+def _has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+XPATH_ITEMS = etree.XPath(f'//li[{_has_class("o-listicle__item")}]')
+XPATH_QUOTE_LINK = etree.XPath(f'.//div[{_has_class("m-statement__quote")}]//a')
+XPATH_METER = etree.XPath(f'.//div[{_has_class("m-statement__meter")}]')
+XPATH_METER_ALT = etree.XPath('.//img/@alt')
+
+# --- 3. Database Access ---
+# Rows are queued and written in one transaction
+_pending_facts = []
+
+INSERT_FACT_SQL = '''
+    INSERT OR IGNORE INTO fact_checks 
+    (claim, verdict, source_url, checker_site)
+    VALUES (?, ?, ?, ?)
+'''
+
 def save_fact_check(data):
-    """Inserts the fact-check into the database."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    """Queues the fact-check to be inserted on the next flush_fact_checks() call."""
+    _pending_facts.append(data)
+
+def flush_fact_checks():
+    """
+    Inserts all queued fact-checks in a single transaction.
+    Table 'fact_checks' must exist (created by db_setup.py).
+    Returns the number of new rows saved (duplicates are ignored).
+    """
+    if not _pending_facts:
+        return 0
+
     try:
-        # Table 'fact_checks' must exist (created by db_setup.py)
-        c.execute('''
-            INSERT OR IGNORE INTO fact_checks 
-            (claim, verdict, source_url, checker_site)
-            VALUES (?, ?, ?, ?)
-        ''', data)
-        
-        if c.rowcount > 0:
-            print(f"   ⚖️  Verdict saved: [{data[1]}] {data[0][:40]}...")
-            conn.commit()
-        else:
-            # Duplicate found
-            pass
+        with transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(INSERT_FACT_SQL, _pending_facts)
+            saved = conn.total_changes - before
+        print(f"   ⚖️  Verdicts saved: {saved} new ({len(_pending_facts) - saved} duplicates skipped).")
+        return saved
             
     except Exception as e:
         print(f"   ❌ Database Error: {e}")
+        return 0
     finally:
-        conn.close()
+        _pending_facts.clear()
 
-def scrape_politifact_page(page_number):
-    """Scrapes a single pagination page from PolitiFact."""
+class RateLimiter:
+    """Token bucket shared by all workers: allows `rate` requests per second."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request is allowed."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+rate_limiter = RateLimiter(REQUESTS_PER_SECOND)
+
+def scrape_politifact_page(page_number, session):
+    """
+    Scrapes a single pagination page from PolitiFact.
+    Returns the list of extracted fact-check rows (safe to call from worker threads).
+    """
     url = BASE_URL.format(page_number)
     print(f"\n📄 Analyzing page {page_number}: {url}")
-    
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+    rows = []
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        rate_limiter.acquire() # Be polite to the server
+        response = session.get(url, timeout=10)
         if response.status_code != 200:
             print(f"   ❌ Error {response.status_code}: Could not fetch page.")
-            return
+            return rows
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # lxml parses in C and XPath returns the exact nodes we need
+        tree = html.fromstring(response.content)
         
         # Find all fact-check items (PolitiFact structure as of 2024/2025)
         # They usually use <li class="o-listicle__item">
-        items = soup.find_all('li', class_='o-listicle__item')
+        items = XPATH_ITEMS(tree)
         
         if not items:
             print("   ⚠️ No items found. Did the website structure change?")
-            return
+            return rows
 
-        count = 0
         for item in items:
             try:
                 # 1. Extract The Statement (Claim)
-                quote_div = item.find('div', class_='m-statement__quote')
-                if not quote_div: continue
+                links = XPATH_QUOTE_LINK(item)
+                if not links: continue
                 
-                link_tag = quote_div.find('a')
-                claim_text = link_tag.text.strip()
-                full_link = "https://www.politifact.com" + link_tag['href']
+                link_tag = links[0]
+                claim_text = link_tag.text_content().strip()
+                full_link = "https://www.politifact.com" + link_tag.get('href')
                 
                 # 2. Extract The Verdict (True/False/etc)
                 # It's usually in an image alt tag or class
-                meter_div = item.find('div', class_='m-statement__meter')
-                if meter_div:
-                    img_tag = meter_div.find('img')
-                    verdict_raw = img_tag.get('alt', 'Unknown')
+                meter = XPATH_METER(item)
+                if meter:
+                    alts = XPATH_METER_ALT(meter[0])
+                    verdict_raw = alts[0] if alts else 'Unknown'
                     
                     # Clean the verdict (e.g. "true" -> "TRUE", "pants-fire" -> "FAKE")
                     verdict = verdict_raw.lower()
                 else:
                     verdict = "unknown"
 
-                # 3. Store Data
-                data = (claim_text, verdict, full_link, "PolitiFact")
-                save_fact_check(data)
-                count += 1
+                # 3. Collect Data (stored by the main thread)
+                rows.append((claim_text, verdict, full_link, "PolitiFact"))
                 
             except Exception as e:
                 print(f"   ⚠️ Parsing error on item: {e}")
                 continue
                 
-        print(f"   ✅ Extracted {count} facts from page {page_number}.")
+        print(f"   ✅ Extracted {len(rows)} facts from page {page_number}.")
 
     except Exception as e:
         print(f"   ❌ Network error: {e}")
 
+    return rows
+
 if __name__ == "__main__":
     if not os.path.exists(DB_PATH):
         print(f"❌ Database not found at: {DB_PATH}")
@@ -109,9 +167,19 @@ if __name__ == "__main__":
     else:
         print("--- 🦅 JUDGE AGENT STARTED (PolitiFact) ---")
         
-        for i in range(1, PAGES_TO_SCRAPE + 1):
-            scrape_politifact_page(i)
-            time.sleep(1) # Be polite to the server
+        # One session for all pages: TCP/TLS connections are reused
+        session = requests.Session()
+        session.headers.update({'User-Agent': USER_AGENT})
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+            pages = ex.map(lambda p: scrape_politifact_page(p, session), range(1, PAGES_TO_SCRAPE + 1))
+
+            # DB writes stay on the main thread (single connection, one transaction)
+            for rows in pages:
+                for data in rows:
+                    save_fact_check(data)
+
+        flush_fact_checks()
             
         print("\n--- 🏁 JUDGEMENT DAY COMPLETE ---")
         print("Check the 'fact_checks' table in your database.")
\ No newline at end of file
@@ -1,107 +1,147 @@
 import sys
 import os
-import sqlite3
+import numpy as np
 import pandas as pd
 import joblib
 
 # --- 1. Path Configuration (Manual) ---
 # Subimos 2 niveles: src/python -> src -> ROOT
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-DB_PATH = os.path.join(BASE_DIR, "data", "database.db")
+sys.path.append(BASE_DIR)  # 'utils' (helpers referenced by the saved pipeline)
 MODEL_PATH = os.path.join(BASE_DIR, "models", "bow_logit_v1.joblib")
 
+# Conexión SQLite compartida (módulo _db de los scrapers)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scrapers'))
+from _db import get_conn, transaction
+
+# Filas por bloque de predicción: el pico de memoria depende del bloque, no del corpus
+PREDICT_CHUNK_SIZE = 4096
+
 # --- 2. Load Model ---
 print(f"🧠 Loading Brain from: {MODEL_PATH}")
 try:
-    model = joblib.load(MODEL_PATH)
+    # mmap_mode='r': los arrays grandes (coef_, idf_) se mapean desde el fichero
+    model = joblib.load(MODEL_PATH, mmap_mode='r')
+    model.predict(["_"])  # Warm-up: carga en memoria las páginas de los coeficientes
     print("✅ Model loaded successfully.")
 except FileNotFoundError:
     print("❌ Error: Model not found. Train it first!")
     exit()
 
-def get_pending_articles():
-    """Fetches articles that haven't been analyzed yet."""
-    conn = sqlite3.connect(DB_PATH)
+def get_pending_articles(limit=PREDICT_CHUNK_SIZE):
+    """Fetches the next block of articles that haven't been analyzed yet."""
     # Leemos solo lo necesario: ID, Título y Texto
-    query = "SELECT id, title, text, source FROM articles WHERE is_processed = 0"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+    # El índice parcial idx_articles_unprocessed evita recorrer toda la tabla
+    query = "SELECT id, title, text, source FROM articles WHERE is_processed = 0 LIMIT ?"
+    return pd.read_sql_query(query, get_conn(), params=(limit,))
+
+def predict_in_chunks(texts):
+    """
+    Runs the pipeline once per chunk of texts.
+    Returns (labels, confidences) where confidence is the prob of the predicted class.
+    """
+    labels, confidences = [], []
+    for start in range(0, len(texts), PREDICT_CHUNK_SIZE):
+        probs = model.predict_proba(texts[start:start + PREDICT_CHUNK_SIZE])
+        best = probs.argmax(axis=1)
+        labels.append(model.classes_[best])
+        confidences.append(probs[np.arange(len(best)), best])
+    return np.concatenate(labels), np.concatenate(confidences)
 
 def save_predictions(df_results):
-    """Saves predictions to the 'predictions' table and updates 'articles'."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
+    """
+    Saves predictions to the 'predictions' table and updates 'articles'.
+    Returns True if the transaction was committed.
+    """
     print(f"💾 Saving {len(df_results)} predictions to database...")
     
+    # Filas planas (sin iterrows): una tupla por artículo
+    ids = df_results['id'].astype(int).tolist()
+    rows = list(zip(ids,
+                    ['bow_logit_v1'] * len(ids),
+                    df_results['pred_label'].astype(int).tolist(),
+                    df_results['confidence'].astype(float).tolist()))
+    
     try:
-        # 1. Insertar en tabla de predicciones
-        for index, row in df_results.iterrows():
-            c.execute('''
+        # Una sola transacción para ambas sentencias (un único commit)
+        with transaction() as c:
+            # 1. Insertar en tabla de predicciones
+            c.executemany('''
                 INSERT INTO predictions 
                 (article_id, model_version, predicted_label, confidence_score)
                 VALUES (?, ?, ?, ?)
-            ''', (row['id'], 'bow_logit_v1', row['pred_label'], row['confidence']))
+            ''', rows)
             
-            # 2. Marcar artículo como procesado
-            c.execute('UPDATE articles SET is_processed = 1 WHERE id = ?', (row['id'],))
+            # 2. Marcar artículos como procesados
+            c.executemany('UPDATE articles SET is_processed = 1 WHERE id = ?', [(i,) for i in ids])
             
-        conn.commit()
         print("✅ Database updated.")
+        return True
         
     except Exception as e:
+        # transaction() ya ha hecho rollback
         print(f"❌ Database Error: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+        return False
 
-# --- 3. Main Execution ---
-if __name__ == "__main__":
-    print("--- 🔮 LAKE PREDICTOR STARTED ---")
-    
-    # 1. Get Data
-    print("🎣 Fishing for new articles in the lake...")
-    df = get_pending_articles()
-    
-    if df.empty:
-        print("💤 No pending articles found. Run the Hunter first!")
-        exit()
-        
-    print(f"   Found {len(df)} new articles to analyze.")
-    
-    # 2. Predict
-    print("⚡ Analyzing content...")
-    # El pipeline se encarga de vectorizar el texto crudo
-    predictions = model.predict(df['text'])
-    probs = model.predict_proba(df['text'])
-    
-    # 3. Process Results
-    # Extraemos la confianza de la clase ganadora
-    confidences = [probs[i][pred] for i, pred in enumerate(predictions)]
-    
-    # Añadimos columnas al DataFrame temporal
-    df['pred_label'] = predictions
-    df['confidence'] = confidences
-    
-    # 4. Show Report (Preview)
+def show_report(df):
+    """Prints a preview of the first predictions."""
     print("\n" + "="*80)
     print(f"{'SOURCE':<15} | {'VERDICT':<8} | {'CONF':<6} | {'HEADLINE'}")
     print("="*80)
     
-    fake_count = 0
-    
     for i, row in df.head(15).iterrows(): # Mostramos solo las primeras 15
         label = "FAKE 🚨" if row['pred_label'] == 1 else "REAL ✅"
         conf = row['confidence']
         title = (row['title'][:45] + '..') if len(row['title']) > 45 else row['title']
         
-        if row['pred_label'] == 1: fake_count += 1
-        
         print(f"{row['source'][:15]:<15} | {label:<8} | {conf:.0%}   | {title}")
         
     print("="*80)
-    print(f"📊 SUMMARY: Found {fake_count} potential FAKES out of {len(df)} articles.")
+
+# --- 3. Main Execution ---
+if __name__ == "__main__":
+    print("--- 🔮 LAKE PREDICTOR STARTED ---")
+    print("🎣 Fishing for new articles in the lake...")
+    
+    total_count = 0
+    fake_count = 0
     
-    # 5. Save to DB
-    save_predictions(df)
\ No newline at end of file
+    # Procesamos el lago por bloques: cada bloque se predice y se guarda
+    # antes de leer el siguiente, así la memoria no crece con el lago
+    while True:
+        # 1. Get Data
+        df = get_pending_articles()
+        
+        if df.empty:
+            break
+            
+        print(f"   Found {len(df)} new articles to analyze.")
+        
+        # 2. Predict
+        print("⚡ Analyzing content...")
+        # El pipeline se encarga de vectorizar el texto crudo
+        # Una sola pasada (predict_proba) por bloque: la etiqueta es el argmax
+        # y la confianza es la probabilidad de la clase ganadora
+        predictions, confidences = predict_in_chunks(df['text'].values)
+        
+        # 3. Process Results
+        # Añadimos columnas al DataFrame temporal
+        df['pred_label'] = predictions
+        df['confidence'] = confidences
+        
+        # 4. Show Report (Preview) del primer bloque
+        if total_count == 0:
+            show_report(df)
+            
+        total_count += len(df)
+        fake_count += int((df['pred_label'] == 1).sum())
+        
+        # 5. Save to DB (si falla, paramos para no releer el mismo bloque)
+        if not save_predictions(df):
+            break
+    
+    if total_count == 0:
+        print("💤 No pending articles found. Run the Hunter first!")
+        exit()
+        
+    print(f"📊 SUMMARY: Found {fake_count} potential FAKES out of {total_count} articles.")
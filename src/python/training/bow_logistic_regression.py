@@ -2,22 +2,27 @@
 # NLP CLASSIFICATION PIPELINE (Bag of Words + Logistic Regression)
 # 1. Data Loading & Selection
 # 2. Train/Test Split
-# 3. Pipeline Construction (CountVectorizer + LogReg)
+# 3. Pipeline Construction (Hashing TF-IDF + LogReg)
 # 4. Model Training & Evaluation
 ################################################################################
 
 # --- Imports ---
 import sys
 import os
+import argparse
+import importlib.util
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 
+import numpy as np
 import pandas as pd
 import time
+import hashlib
+import joblib
 # Scikit-learn modules
 from sklearn.pipeline import Pipeline
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import StratifiedShuffleSplit
 from sklearn.metrics import (
     classification_report, 
     accuracy_score, 
@@ -25,15 +30,104 @@ from sklearn.metrics import (
     recall_score, 
     f1_score
 )
+# Fast CSV parsing (optional): multithreaded C++ reader
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pv
+except ImportError:
+    pa = pv = None
+# lz4 (optional) is much faster than joblib's default zlib compression
+HAS_LZ4 = importlib.util.find_spec('lz4') is not None
 # Custom utilities
 from utils.data_tools import check_overfitting
+from utils.text_tools import ParallelHashingTfidf
 # from utils.data_tools import underSample2Min # Uncomment if balancing is needed
 
 # --- 1. Data Loading ---
 
+DATA_PATH = "data/processed/news_prepared.csv"
+COLUMNS = ['text_tfidf', 'is_fake']  # Only these two columns are used
+
+def load_dataset(path):
+    """
+    Loads only the needed columns of the prepared dataset, with 'is_fake' as int8.
+    Uses pyarrow's multithreaded parser when available, pandas otherwise.
+    """
+    if pv is not None:
+        table = pv.read_csv(path, convert_options=pv.ConvertOptions(
+            include_columns=COLUMNS,
+            column_types={'is_fake': pa.int8()}
+        ))
+        return table.to_pandas()
+    return pd.read_csv(path, usecols=COLUMNS, dtype={'is_fake': 'int8'})
+
+# --- 1b. Streaming Training (optional, --streaming) ---
+# For corpora that don't fit in RAM: the CSV is read in chunks, hashed
+# (stateless, no vocabulary/IDF to fit) and fed to an SGD logistic regression.
+# Memory stays flat regardless of corpus size.
+
+STREAM_CHUNK_ROWS = 100_000
+STREAM_MODEL_FILENAME = 'models/bow_sgd_stream_v1.joblib'
+
+def iter_chunks(path):
+    """Yields (texts, labels) chunks of the dataset without loading it whole."""
+    if pv is not None:
+        reader = pv.open_csv(path, convert_options=pv.ConvertOptions(
+            include_columns=COLUMNS,
+            column_types={'is_fake': pa.int8()}
+        ))
+        # The reader yields ~1 MB blocks: re-batch them to STREAM_CHUNK_ROWS rows
+        # so both back-ends train on the same batch size
+        buffer, n_buffered = [], 0
+        for batch in reader:
+            buffer.append(batch)
+            n_buffered += batch.num_rows
+            while n_buffered >= STREAM_CHUNK_ROWS:
+                table = pa.Table.from_batches(buffer)
+                chunk, rest = table.slice(0, STREAM_CHUNK_ROWS), table.slice(STREAM_CHUNK_ROWS)
+                yield chunk.column('text_tfidf').to_pylist(), chunk.column('is_fake').to_numpy()
+                buffer, n_buffered = rest.to_batches(), rest.num_rows
+        if n_buffered:
+            table = pa.Table.from_batches(buffer)
+            yield table.column('text_tfidf').to_pylist(), table.column('is_fake').to_numpy()
+    else:
+        for chunk in pd.read_csv(path, usecols=COLUMNS, dtype={'is_fake': 'int8'}, chunksize=STREAM_CHUNK_ROWS):
+            yield chunk['text_tfidf'].tolist(), chunk['is_fake'].to_numpy()
+
+def train_streaming(path):
+    """Trains a HashingVectorizer + SGDClassifier(log_loss) pipeline chunk by chunk and saves it."""
+    vectorizer = HashingVectorizer(n_features=2**20, stop_words='english', alternate_sign=False,
+                                   norm='l2', dtype=np.float32)
+    sgd = SGDClassifier(loss='log_loss', random_state=0)
+
+    n_rows = 0
+    for texts, labels in iter_chunks(path):
+        sgd.partial_fit(vectorizer.transform(texts), labels, classes=[0, 1])
+        n_rows += len(labels)
+        print(f"   Trained on {n_rows} rows...")
+
+    model = Pipeline([
+        ('vectorizer', vectorizer),
+        ('classifier', sgd)
+    ])
+    joblib.dump(model, STREAM_MODEL_FILENAME)
+    print(f"\n💾 Streaming model saved successfully at: {STREAM_MODEL_FILENAME}")
+
+parser = argparse.ArgumentParser(description="Train the Bag-of-Words fake news classifier.")
+parser.add_argument('--streaming', action='store_true',
+                    help="Train chunk by chunk with SGD (flat memory) instead of in memory.")
+args = parser.parse_args()
+
+if args.streaming:
+    try:
+        train_streaming(DATA_PATH)
+    except FileNotFoundError:
+        print("❌ Error: 'news_prepared.csv' not found. Please check the directory.")
+    sys.exit()
+
 try:
     # Load the dataset prepared in R
-    df = pd.read_csv("data/processed/news_prepared.csv") # returns pandas.DataFrame
+    df = load_dataset(DATA_PATH) # returns pandas.DataFrame
     print("✅ Dataset loaded successfully.")
 except FileNotFoundError:
     print("❌ Error: 'news_prepared.csv' not found. Please check the directory.")
@@ -43,15 +137,18 @@ except FileNotFoundError:
 
 # We use 'text_tfidf', which was cleaned in the R script (lowercase, no punctuation)
 X = df['text_tfidf']  # Input features (pandas.Series)
-y = df['is_fake']     # Target labels (pandas.Series)
+y = df['is_fake']     # Target labels (pandas.Series, int8 enforced at load time)
 
-# Ensure target is integer type
-y = y.astype(int)
+# Labels are cast to int8 codes once; the balance check, the split and both subsets reuse them.
+y_codes = y.to_numpy(dtype=np.int8)
 
 # Check class balance
 # Class 0 (True) is approx 55%, so undersampling is not strictly necessary.
+# np.bincount: one C pass over the codes, no hashing or intermediate Series
+counts = np.bincount(y_codes)
 print("\n--- Class Balance (%) ---")
-print(y.value_counts(normalize=True) * 100)
+for label, pct in enumerate(counts * 100.0 / counts.sum()):
+    print(f"{label}: {pct:.2f}")
 
 # --- 3. Train / Test Split ---
 
@@ -60,13 +157,34 @@ print(f'Original y shape: {y.shape}')
 
 # Split the dataset into training and testing sets
 # test_size=0.20: 80% for training, 20% for testing
-# stratify=y: Maintains the same proportion of Fake/True news in both sets
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, 
-    test_size=0.20, 
-    random_state=0, 
-    stratify=y 
-)
+# Stratified: Maintains the same proportion of Fake/True news in both sets
+# We split integer row indices (cheap) and gather the documents once per subset,
+# instead of shuffling copies of the Series of strings.
+# The indices are cached on disk, keyed by the labels and the split parameters:
+# reruns on the same CSV just read them back (plain .npz, no pickle).
+TEST_SIZE = 0.20
+SPLIT_SEED = 0
+
+split_key = hashlib.blake2b(
+    pd.util.hash_pandas_object(y, index=False).values.tobytes()
+    + f"{TEST_SIZE}-{SPLIT_SEED}".encode(),
+    digest_size=8
+).hexdigest()
+split_path = f"models/split_{split_key}.npz"
+
+if os.path.exists(split_path):
+    print(f"\nLoading cached split: {split_path}")
+    with np.load(split_path, allow_pickle=False) as split:
+        train_idx, test_idx = split['train_idx'], split['test_idx']
+else:
+    sss = StratifiedShuffleSplit(n_splits=1, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+    train_idx, test_idx = next(sss.split(np.zeros(len(y_codes)), y_codes))
+    np.savez(split_path, train_idx=train_idx, test_idx=test_idx)
+
+X_train = X.iloc[train_idx]
+X_test = X.iloc[test_idx]
+y_train = y_codes[train_idx]
+y_test = y_codes[test_idx]
 
 # Inspect shapes of resulting subsets
 print("\n--- Data Shapes after Split ---")
@@ -86,9 +204,21 @@ for name, var in dataset_vars.items():
 
 # Bag-of-Words approach: Convert text documents to fixed-length vectors of counts.
 # This creates a Document-Term Matrix (DTM).
+# Tokens are hashed into a fixed number of columns (no vocabulary dict to build),
+# then reweighted with TF-IDF. Stop words are dropped by the hasher's tokenizer.
+# Tokenizing and hashing run on row chunks in parallel (one per core);
+# the float32 counts halve the memory traffic of the sparse matrix through the solver.
 cp = Pipeline([
-    ('vectorizer', TfidfVectorizer(norm='l2')),       # Converts text to token counts
-    ('classifier', LogisticRegression())     # Probabilistic Linear Classifier
+    ('vectorizer', ParallelHashingTfidf(
+        n_features=2**20,
+        stop_words='english',  # Remove common words (the, is, at...)
+        sublinear_tf=True,     # 1 + log(tf) dampens repeated words
+        n_jobs=-1
+    )),
+    # 'saga' works row by row on the CSR matrix (only non-zero features),
+    # converging in far fewer passes than 'lbfgs' on sparse bag-of-words
+    # (2**20 hashed columns are far below 1% dense: densifying never pays off)
+    ('classifier', LogisticRegression(solver='saga', tol=1e-3, max_iter=1000))     # Probabilistic Linear Classifier
     # Alternative: ('classifier', LinearSVC())
 ])
 
@@ -98,7 +228,6 @@ cp = Pipeline([
 # Syntax: 'component_name__parameter_name'
 clsfParams = {
     'classifier__C': 1.0,  
-    'vectorizer__stop_words': 'english',  # Remove common words (the, is, at...)
     'vectorizer__ngram_range': (1, 1),    # (1,1) = Unigrams only. (1,2) = Unigrams + Bigrams.
 }
 
@@ -117,8 +246,30 @@ cp.set_params(**clsfParams)
 
 # --- 6. Training & Prediction ---
 
-print("\nTraining the model...")
-cp.fit(X_train, y_train)
+# The steps are run explicitly: the training matrix is reused for the
+# overfitting check instead of being recomputed by the Pipeline.
+vectorizer = cp.named_steps['vectorizer']
+classifier = cp.named_steps['classifier']
+
+print("\nFitting the vectorizer...")
+Xtr = vectorizer.fit_transform(X_train)
+
+# Canonical float32 CSR (sorted column indices, no explicit zeros) for
+# unit-stride access in the solver: made canonical once here, so sklearn's
+# input validation in fit finds nothing to convert or copy
+Xtr = Xtr.tocsr().astype(np.float32, copy=False)
+Xtr.sort_indices()
+Xtr.eliminate_zeros()
+print(f"Training matrix: {Xtr.shape}, {Xtr.dtype}, nnz={Xtr.nnz}")
+
+print("Training the model...")
+classifier.fit(Xtr, y_train)
+
+# Reassemble the fitted steps: same interface as a fitted Pipeline
+cp = Pipeline([
+    ('vectorizer', vectorizer),
+    ('classifier', classifier)
+])
 
 print("Predicting on test set...")
 y_pred = cp.predict(X_test)
@@ -133,12 +284,21 @@ print(f"{accuracy_score(y_test, y_pred):.4f}")
 
 # Custom Overfitting Check
 # Compares Train Accuracy vs Test Accuracy
-check_overfitting(cp, X_train, y_train, X_test, y_test)
+# Reuses y_pred and the already transformed training matrix (no second TF-IDF pass)
+y_pred_train = classifier.predict(Xtr)
+check_overfitting(cp, X_train, y_train, X_test, y_test,
+                  y_pred_train=y_pred_train, y_pred_test=y_pred)
 
 # --- 8. Model Persistence (Export) ---
-import joblib
-import os
 
 model_filename = 'models/bow_logit_v1.joblib'
-joblib.dump(cp, model_filename)
-print(f"\n💾 Model saved successfully at: {model_filename}")
\ No newline at end of file
+# Uncompressed, protocol 5: numpy arrays are stored contiguously so the
+# serving scripts can memory-map them (compressed files cannot be mmapped)
+joblib.dump(cp, model_filename, compress=0, protocol=5)
+print(f"\n💾 Model saved successfully at: {model_filename}")
+
+# Compact lz4 copy for transfer/archiving (2-3x smaller, fast to write).
+# Load it with joblib.load(path) — without mmap_mode.
+if HAS_LZ4:
+    joblib.dump(cp, model_filename + '.lz4', compress=('lz4', 3), protocol=5)
+    print(f"💾 Compressed copy saved at: {model_filename}.lz4")
\ No newline at end of file
@@ -27,6 +27,12 @@ CREATE TABLE IF NOT EXISTS fact_checks (
     scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE TABLE IF NOT EXISTS feed_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,               -- ETag of the last fetch (sent as If-None-Match)
+    last_modified TEXT       -- Last-Modified of the last fetch (sent as If-Modified-Since)
+);
+
 CREATE TABLE IF NOT EXISTS predictions (
     article_id INTEGER,
     model_version TEXT,
@@ -34,4 +40,9 @@ CREATE TABLE IF NOT EXISTS predictions (
     confidence_score REAL,
     prediction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY(article_id) REFERENCES articles(id)
-);
\ No newline at end of file
+);
+
+CREATE INDEX IF NOT EXISTS idx_predictions_article_id ON predictions(article_id);
+
+-- Partial index: the predictor only ever reads the unprocessed rows
+CREATE INDEX IF NOT EXISTS idx_articles_unprocessed ON articles(is_processed) WHERE is_processed = 0;
\ No newline at end of file
@@ -1,4 +1,5 @@
 import pandas as pd
+from sklearn.metrics import accuracy_score
 
 #Some useful tools for data processing
 
@@ -15,37 +16,21 @@ def underSample2Min(df, label_name):
         pd.DataFrame: A new dataframe with balanced classes and a reset index.
     """
     
-    # 1. Count label frequencies
-    # We get the count of each unique value in the target column
-    vc = df[label_name].value_counts()
-    lab2freq = dict(zip(vc.index.tolist(), vc.values.tolist()))
-    
-    # 2. Find the minimum frequency (size of the minority class)
-    min_freq = min(lab2freq.values())
+    # 1. Find the minimum frequency (size of the minority class)
+    min_freq = df[label_name].value_counts().min()
     print(f"--- Undersampling: Reducing all classes to {min_freq} samples ---")
 
-    # 3. Random sampling
-    idx_sample = []
-    for selected_label, _ in lab2freq.items():
-        # Filter by class and sample 'min_freq' random indices
-        # random_state=42 ensures reproducibility
-        sel_indexes = df[df[label_name] == selected_label].sample(n=min_freq, random_state=42).index.tolist()
-        idx_sample += sel_indexes
-    
+    # 2. Random sampling per class in one grouped call
+    # random_state=42 ensures reproducibility
     # Sort indices to maintain some original order (optional)
-    idx_sample.sort()
-
-    # 4. Construct the new DataFrame
-    # Extract rows based on the selected indices
-    df_balanced = df.loc[idx_sample, :].copy()
-    
     # Reset index to avoid gaps in the index sequence
-    # drop=True removes the old index column entirely
-    df_balanced = df_balanced.reset_index(drop=True)
-    
-    return df_balanced
+    return (df.groupby(label_name, group_keys=False)
+              .sample(n=min_freq, random_state=42)
+              .sort_index()
+              .reset_index(drop=True))
 
-def check_overfitting(model, X_train, y_train, X_test, y_test, threshold=0.05):
+def check_overfitting(model, X_train, y_train, X_test, y_test, threshold=0.05,
+                      y_pred_train=None, y_pred_test=None):
     """
     Calculates and compares accuracy scores for training and test sets 
     to diagnose potential overfitting.
@@ -58,6 +43,8 @@ def check_overfitting(model, X_train, y_train, X_test, y_test, threshold=0.05):
         y_test: Test labels.
         threshold (float): The maximum acceptable difference between train and test 
                            accuracy before flagging overfitting (default: 0.05 for 5%).
+        y_pred_train: Optional pre-computed predictions on X_train (skips re-predicting).
+        y_pred_test: Optional pre-computed predictions on X_test (skips re-predicting).
 
     Returns:
         dict: A dictionary containing 'train_accuracy', 'test_accuracy', and 'gap'.
@@ -67,8 +54,16 @@ def check_overfitting(model, X_train, y_train, X_test, y_test, threshold=0.05):
     
     # 1. Calculate scores
     # .score() returns accuracy for classification models by default
-    train_acc = model.score(X_train, y_train)
-    test_acc = model.score(X_test, y_test)
+    # If predictions are given, reuse them instead of transforming X again
+    if y_pred_train is not None:
+        train_acc = accuracy_score(y_train, y_pred_train)
+    else:
+        train_acc = model.score(X_train, y_train)
+
+    if y_pred_test is not None:
+        test_acc = accuracy_score(y_test, y_pred_test)
+    else:
+        test_acc = model.score(X_test, y_test)
     
     # 2. Calculate the gap (How much better is the model on training data?)
     gap = train_acc - test_acc
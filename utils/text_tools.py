@@ -0,0 +1,66 @@
+import numpy as np
+import scipy.sparse as sp
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.utils.validation import check_is_fitted
+
+#Text helpers used inside the sklearn pipelines.
+#They must live in an importable module: saved pipelines reference them by name.
+
+class ParallelHashingTfidf(TransformerMixin, BaseEstimator):
+    """
+    Hashing TF-IDF vectorizer that tokenizes row chunks in parallel.
+
+    Documents are independent, so the corpus is split into n_jobs chunks,
+    each chunk is tokenized and hashed in a worker, and the
+    blocks are stacked back into one CSR matrix. Only the IDF weights
+    (TfidfTransformer) are fitted, on the stacked counts.
+
+    Args:
+        n_features (int): Number of hashed columns.
+        ngram_range (tuple): Token n-gram range passed to the hasher.
+        stop_words (str or None): Stop-word list passed to the hasher
+            ('english' drops the tokens found in sklearn's frozenset).
+        sublinear_tf (bool): Use 1 + log(tf) instead of raw counts.
+        n_jobs (int): Number of workers (-1 = all cores).
+        min_parallel_docs (int): Below this many documents, hash serially
+            (e.g. single predictions), since starting workers costs more.
+    """
+
+    def __init__(self, n_features=2**20, ngram_range=(1, 1), stop_words='english',
+                 sublinear_tf=True, n_jobs=-1, min_parallel_docs=10_000):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.stop_words = stop_words
+        self.sublinear_tf = sublinear_tf
+        self.n_jobs = n_jobs
+        self.min_parallel_docs = min_parallel_docs
+
+    def _hash(self, X):
+        hasher = HashingVectorizer(
+            n_features=self.n_features, ngram_range=self.ngram_range,
+            stop_words=self.stop_words, alternate_sign=False, norm=None, dtype=np.float32
+        )
+        X = np.asarray(X, dtype=object)
+        n_jobs = effective_n_jobs(self.n_jobs)
+        if n_jobs == 1 or len(X) < self.min_parallel_docs:
+            return hasher.transform(X)
+        blocks = Parallel(n_jobs=n_jobs, backend='loky')(
+            delayed(hasher.transform)(chunk)
+            for chunk in np.array_split(X, n_jobs)
+        )
+        return sp.vstack(blocks, format='csr')
+
+    def fit(self, X, y=None):
+        self.fit_transform(X)
+        return self
+
+    def fit_transform(self, X, y=None):
+        counts = self._hash(X)
+        self.tfidf_ = TfidfTransformer(norm='l2', sublinear_tf=self.sublinear_tf)
+        return self.tfidf_.fit_transform(counts)
+
+    def transform(self, X):
+        check_is_fitted(self, 'tfidf_')
+        return self.tfidf_.transform(self._hash(X))